@@ -1,4 +1,6 @@
 import asyncio
+import collections
+import datetime
 import sys
 import pytest
 import serial
@@ -46,6 +48,16 @@ def test_close(api):
     assert api._uart is None
 
 
+@pytest.mark.asyncio
+async def test_erase_then_close(api):
+    uart = api._uart
+    await api.erase_persistent_data()
+    api.close()
+    assert uart.write.call_count == 1
+    assert uart.write.call_args[0][0] == zigpy_zigate.uart.frame(0x0012, b"")
+    assert uart.close.call_count == 1
+
+
 @pytest.mark.asyncio
 @patch.object(zigpy_zigate.uart, "connect")
 async def test_api_new(conn_mck):
@@ -103,11 +115,138 @@ async def test_probe_fail(mock_connect, mock_raw_mode, exception):
 
 
 @pytest.mark.asyncio
-@patch.object(asyncio, "wait_for", side_effect=asyncio.TimeoutError)
+@patch.object(zigate_api, "_await_with_timeout", side_effect=asyncio.TimeoutError)
 async def test_api_command(mock_command, api):
     """Test command method."""
-    try:
+    with pytest.raises(zigate_api.NoStatusError):
         await api.set_raw_mode()
-    except zigate_api.NoResponseError:
-        pass
-    assert mock_command.call_count == 3
+    assert mock_command.call_count == 1
+    assert api._by_cmd[0x0002] == collections.deque()
+    assert api._by_sqn == {}
+
+
+@pytest.mark.asyncio
+async def test_api_command_pipelined(api):
+    """Test commands don't wait for the previous command status."""
+    fut1 = asyncio.ensure_future(api.raw_aps_data_request(0x1234, 1, 1, 0x0104, 0x0006, b'\x01'))
+    fut2 = asyncio.ensure_future(api.raw_aps_data_request(0x5678, 1, 1, 0x0104, 0x0006, b'\x02'))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    # both frames are written at once
+    assert api._uart.write.call_count == 1
+    assert api._uart.write.call_args[0][0].count(zigpy_zigate.uart.END) == 2
+
+    # status frames are matched in order, data confirms by APS SQN
+    api.data_received(0x8000, b'\x00\x01\x05\x30\x01\x10', 255)
+    api.data_received(0x8000, b'\x00\x02\x05\x30\x01\x11', 255)
+    await asyncio.sleep(0)
+    api.data_received(0x8012, b'\x00\x01\x01\x02\x56\x78\x11', 255)
+    api.data_received(0x8012, b'\x00\x01\x01\x02\x12\x34\x10', 255)
+
+    res1, res2 = await asyncio.gather(fut1, fut2)
+    assert res1[0][4] == 0x10
+    assert res2[0][4] == 0x11
+    assert api._by_sqn == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "channels, mask",
+    ((11, 0x00000800), ([11, 15, 26], 0x04008800)),
+)
+async def test_set_channel(api, channels, mask):
+    api.command = AsyncMock()
+    await api.set_channel(channels)
+    assert api.command.call_args[0] == (0x0021, mask.to_bytes(4, 'big'))
+
+
+@pytest.mark.asyncio
+async def test_set_channel_invalid(api):
+    api.command = AsyncMock()
+    with pytest.raises(KeyError):
+        await api.set_channel(27)
+    assert api.command.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_configure_batch(api):
+    calls = []
+
+    async def mock_command(cmd, data=b'', **kwargs):
+        calls.append(cmd)
+        if cmd == 0x0010:
+            return [5, 0x0321], 0
+        return [0], 0
+
+    api.command = mock_command
+    await api.configure_batch(channels=[11], ext_panid=0x1234)
+    assert calls[0] == 0x0011
+    assert sorted(calls[1:]) == [0x0002, 0x0010, 0x0018, 0x0019, 0x0020, 0x0021]
+
+
+@pytest.mark.parametrize(
+    "cmd, data",
+    (
+        (0x8000, b'\x00\x01\x05\x30\x01\x10'),
+        (0x8000, b'\x00\x01\x05\x30\x01\x10\xbe\xef'),
+        (0x8000, b'\x00\x01\x00\x02'),
+        (0x8011, b'\x00\x12\x34\x01\x00\x06\x10'),
+        (0x004D, b'\x12\x34\x01\x02\x03\x04\x05\x06\x07\x08\x8e\x00'),
+        (0x8009, b'\x00\x00\x01\x02\x03\x04\x05\x06\x07\x08\x12\x34'
+                 b'\x01\x02\x03\x04\x05\x06\x07\x08\x0b'),
+        (0x8024, b'\x06'),
+        (0x8048, b'\x01\x02\x03\x04\x05\x06\x07\x08\x00'),
+    ),
+)
+def test_deserialize_response(cmd, data):
+    expected, _ = zigate_api.t.deserialize(data, zigate_api.RESPONSES[cmd])
+    result = list(zigate_api._deserialize_response(cmd, memoryview(data)))
+    assert result == expected
+    if cmd != 0x8000:
+        assert [type(v) for v in result] == [type(v) for v in expected]
+
+
+def test_responses_fast():
+    assert 0x8011 in zigate_api.RESPONSES_FAST
+    assert 0x004D in zigate_api.RESPONSES_FAST
+    assert 0x8002 not in zigate_api.RESPONSES_FAST
+    assert 0x8012 not in zigate_api.RESPONSES_FAST
+
+
+@pytest.mark.asyncio
+async def test_api_command_timeout(api):
+    with pytest.raises(zigate_api.NoStatusError):
+        await api.command(0x0002, timeout=0.01)
+    assert not api._by_cmd[0x0002]
+
+
+@pytest.mark.asyncio
+async def test_set_time(api):
+    api.command = AsyncMock()
+    await api.set_time(datetime.datetime(2000, 1, 2, 0, 0, 1, 500000))
+    assert api.command.call_args[0] == (0x0016, (86401).to_bytes(4, 'big'))
+
+
+@pytest.mark.asyncio
+async def test_get_time_server(api):
+    api.command = AsyncMock(return_value=([86401], 0))
+    assert await api.get_time_server() == datetime.datetime(2000, 1, 2, 0, 0, 1)
+
+
+@pytest.mark.parametrize("app", (None, sentinel.app))
+def test_data_received_log_message(api, app, monkeypatch):
+    api.set_application(app)
+    monkeypatch.setattr(zigate_api.t, "deserialize", MagicMock(return_value=([b'log'], b'')))
+    api.handle_callback = MagicMock()
+    api.data_received(0x8001, b'log', 255)
+    assert api.handle_callback.call_count == (0 if app is None else 1)
+
+
+def test_deserialize_response_named():
+    status = zigate_api._deserialize_response(0x8000, b'\x00\x01\x05\x30\x01\x10')
+    assert (status.status, status.cmd, status.aps_sqn) == (0x00, 0x0530, 0x10)
+    # old firmwares send shorter status frames
+    status = zigate_api._deserialize_response(0x8000, b'\x00\x01\x00\x02')
+    assert (status.cmd, status.aps_sqn_exist) == (0x0002, None)
+    ack = zigate_api._deserialize_response(0x8011, b'\x00\x12\x34\x01\x00\x06\x10')
+    assert (ack.nwk, ack.aps_sqn) == (0x1234, 0x10)
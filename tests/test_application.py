@@ -43,6 +43,13 @@ def test_model_detection(app):
     assert device.model == 'ZiGate USB-TTL {}'.format(FAKE_FIRMWARE_VERSION)
 
 
+def test_model_detection_probed_once(app):
+    with patch("zigpy_zigate.common.is_zigate_wifi", return_value=False) as wifi:
+        for nwk in range(3):
+            zigpy_zigate.zigbee.application.ZiGateDevice(app, nwk, nwk)
+    assert wifi.call_count == 1
+
+
 @pytest.mark.asyncio
 async def test_form_network_success(app):
     app._api.set_channel = AsyncMock()
@@ -84,3 +91,112 @@ async def test_form_network_failed(app):
 
     with pytest.raises(zigpy.exceptions.FormationFailure):
         await app.form_network()
+
+
+@pytest.mark.asyncio
+async def test_write_network_info_backoff(app):
+    app._api.set_channel = AsyncMock()
+    app._api.set_extended_panid = AsyncMock()
+    app._api.start_network = AsyncMock(return_value=[[0x06], 0])
+    app.load_network_info = AsyncMock(side_effect=zigpy.exceptions.NetworkNotFormed())
+
+    with patch("asyncio.sleep", AsyncMock()) as sleep:
+        with pytest.raises(zigpy.exceptions.FormationFailure):
+            await app.write_network_info(network_info=MagicMock(), node_info=MagicMock())
+    delays = [call[0][0] for call in sleep.call_args_list]
+    assert delays == list(zigpy_zigate.zigbee.application.FORMATION_RETRY_DELAYS)
+    assert sum(delays) <= 3
+
+    # stop polling as soon as the network is formed
+    app.load_network_info = AsyncMock(side_effect=[zigpy.exceptions.NetworkNotFormed(), None])
+    with patch("asyncio.sleep", AsyncMock()) as sleep:
+        await app.write_network_info(network_info=MagicMock(), node_info=MagicMock())
+    assert sleep.call_count == 2
+
+
+def test_callback_handler_dispatch(app):
+    app._handle_frame_failure = MagicMock()
+    app.zigate_callback_handler(0x8702, [0xd4, 0x01, 0x01, None, 0x12, 0x00], 255)
+    assert app._handle_frame_failure.call_count == 1
+    assert app._handle_frame_failure.call_args[0] == (0x12, 0xd4)
+    # unknown messages are ignored
+    app.zigate_callback_handler(0x8701, [0x00, 0x00], 255)
+    assert app._handle_frame_failure.call_count == 1
+
+
+def test_device_announce(app):
+    app.handle_join = MagicMock()
+    app.handle_message = MagicMock()
+    app.get_device = MagicMock()
+    ieee, _ = t.EUI64.deserialize(b"\x01\x02\x03\x04\x05\x06\x07\x08")
+    app.zigate_callback_handler(0x004D, [t.NWK(0x1234), ieee, t.uint8_t(0x8e), t.uint8_t(0)], 255)
+    assert app.handle_join.call_count == 1
+    assert app.handle_message.call_args[1]["cluster"] == 0x0013
+    assert app.handle_message.call_args[1]["message"] == (
+        b"\x00\x34\x12\x08\x07\x06\x05\x04\x03\x02\x01\x8e"
+    )
+
+
+def test_get_device_by_nwk_cache(app):
+    ieee = zigpy_types.EUI64.convert("01:02:03:04:05:06:07:08")
+    device = MagicMock(ieee=ieee, nwk=0x1234)
+    app.devices[ieee] = device
+    app.get_device = MagicMock(wraps=app.get_device)
+
+    assert app._get_device_by_nwk(0x1234) is device
+    assert app._get_device_by_nwk(0x1234) is device
+    assert app.get_device.call_count == 1
+
+    # device got a new address
+    device.nwk = 0x5678
+    with pytest.raises(KeyError):
+        app._get_device_by_nwk(0x1234)
+    assert app._get_device_by_nwk(0x5678) is device
+
+    # device was removed
+    del app.devices[ieee]
+    with pytest.raises(KeyError):
+        app._get_device_by_nwk(0x5678)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw_version, version, version_tuple, old", [
+    (0x0321, '3.21', (3, 0x21), False),
+    (0x031d, '3.1d', (3, 0x1d), True),
+    (0x0309, '3.09', (3, 0x09), True),
+    (0x0400, '4.00', (4, 0x00), False),
+    (0x0005, '5.', (0, 0x05), True),
+])
+async def test_connect_version(app, raw_version, version, version_tuple, old):
+    api = MagicMock()
+    api.set_raw_mode = AsyncMock()
+    api.set_time = AsyncMock()
+    api.version = AsyncMock(return_value=([0x00, raw_version], 255))
+
+    with patch.object(zigpy_zigate.zigbee.application.ZiGate, "new", AsyncMock(return_value=api)), \
+            patch.object(zigpy_zigate.zigbee.application.LOGGER, "warning") as warning:
+        await app.connect()
+
+    assert app.version == version
+    assert app._version_tuple == version_tuple
+    assert warning.called is old
+
+
+def test_intern_eui(app):
+    raw = t.EUI64.deserialize(b"\x01\x02\x03\x04\x05\x06\x07\x08")[0]
+    ieee = app._intern_eui(raw)
+    assert isinstance(ieee, zigpy_types.EUI64)
+    assert ieee == zigpy_types.EUI64(raw)
+    assert app._intern_eui(raw) is ieee
+    assert app._intern_eui(bytes(raw)) is ieee
+
+    with patch.object(zigpy_zigate.zigbee.application, "EUI64_INTERN_SIZE", 2):
+        app._intern_eui(b"\x00" * 8)
+        # a hit keeps the address in the cache
+        assert app._intern_eui(raw) is ieee
+        app._intern_eui(b"\xff" * 8)
+        assert len(app._eui_intern) == 2
+        assert app._intern_eui(raw) is ieee
+        app._intern_eui(b"\xee" * 8)
+        app._intern_eui(b"\xdd" * 8)
+        assert app._intern_eui(raw) is not ieee
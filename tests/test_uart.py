@@ -1,3 +1,6 @@
+import asyncio
+import logging
+import sys
 from .async_mock import MagicMock, AsyncMock
 
 import pytest
@@ -46,6 +49,17 @@ def test_send(gw):
     assert gw._transport.write.call_args[0][0] == frame
 
 
+def test_frame():
+    frame = b'\x01\x02\x150\x02\x10\x02\x114\x02\x10\x03'
+    assert uart.frame(0x0530, b'\x00') == frame
+
+
+def test_write(gw):
+    gw.write(b'\x01\x03')
+    assert gw._transport.write.call_count == 1
+    assert gw._transport.write.call_args[0][0] == b'\x01\x03'
+
+
 def test_close(gw):
     gw.close()
     assert gw._transport.close.call_count == 1
@@ -87,6 +101,37 @@ def test_data_received_extra(gw):
     assert gw._buffer == b'\x00'
 
 
+def test_data_received_multiple_frames(gw):
+    received = []
+    gw._api.data_received.side_effect = lambda cmd, data, lqi: received.append((cmd, bytes(data), lqi))
+    data = b'\x01\x80\x10\x02\x10\x02\x15\xaa\x02\x10\x02\x1f?\xf0\xff\x03'
+    gw.data_received(data + data.replace(b'?', b'@').replace(b'\xaa', b'\xd5'))
+    assert received == [
+        (0x8010, b'\x00\x0f?\xf0', 255),
+        (0x8010, b'\x00\x0f@\xf0', 255),
+    ]
+    assert gw._buffer == b''
+
+
+def test_data_received_debug_log(gw, caplog):
+    # records are formatted after the frames were handled, as buffering handlers do
+    data = b'\x01\x80\x10\x02\x10\x02\x15\xaa\x02\x10\x02\x1f?\xf0\xff\x03'
+    with caplog.at_level(logging.DEBUG, logger=uart.__name__):
+        gw.data_received(data + data.replace(b'?', b'@').replace(b'\xaa', b'\xd5'))
+    frames = [r.getMessage() for r in caplog.records if r.getMessage().startswith('Frame received')]
+    assert frames == [
+        'Frame received: 80100005aa000f3ff0ff',
+        'Frame received: 80100005d5000f40f0ff',
+    ]
+
+
+def test_data_received_short_frame(gw):
+    data = b'\x01\x80\x10\x02\x10\x03'
+    gw.data_received(data)
+    assert gw._api.data_received.call_count == 0
+    assert gw._buffer == b''
+
+
 def test_data_received_wrong_checksum(gw):
     data = b'\x01\x80\x10\x02\x10\x02\x15\xab\x02\x10\x02\x1f?\xf0\xff\x03'
     gw.data_received(data)
@@ -173,3 +218,49 @@ def test_is_not_zigate_wifi():
     port = '/dev/ttyUSB1'
     r = common.is_zigate_wifi(port)
     assert r is False
+
+
+@pytest.mark.asyncio
+async def test_set_zigatedin_running_mode(monkeypatch):
+    dev = MagicMock()
+    monkeypatch.setattr(common.usb.core, 'find', MagicMock(return_value=dev))
+    monkeypatch.setattr(common.asyncio, 'sleep', AsyncMock())
+    await common.set_zigatedin_running_mode()
+    assert dev.ctrl_transfer.call_count == 2
+
+
+async def _running_loop():
+    return asyncio.get_running_loop()
+
+
+def test_run_default_loop(monkeypatch):
+    uvloop = MagicMock()
+    monkeypatch.setitem(sys.modules, 'uvloop', uvloop)
+    assert isinstance(common.run(_running_loop()), asyncio.AbstractEventLoop)
+    assert uvloop.new_event_loop.call_count == 0
+    assert uvloop.run.call_count == 0
+
+
+def test_run_uvloop(monkeypatch):
+    uvloop = MagicMock()
+    loop = asyncio.new_event_loop()
+    uvloop.new_event_loop.return_value = loop
+    monkeypatch.setitem(sys.modules, 'uvloop', uvloop)
+    if sys.version_info >= (3, 11):
+        assert common.run(_running_loop(), use_uvloop=True) is loop
+        assert uvloop.new_event_loop.call_count == 1
+    else:
+        coro = _running_loop()
+        common.run(coro, use_uvloop=True)
+        uvloop.run.assert_called_once_with(coro)
+        coro.close()
+        loop.close()
+
+
+def test_run_uvloop_not_available(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'uvloop', None)
+    assert isinstance(common.run(_running_loop(), use_uvloop=True), asyncio.AbstractEventLoop)
+
+
+def test_lazy_hex():
+    assert str(common.LazyHex(b'\x01\xab')) == '01ab'
@@ -1,10 +1,13 @@
 import asyncio
 import binascii
-import functools
+import collections
 import logging
+import struct
+import sys
 import enum
+import functools
 import datetime
-from typing import Any, Dict
+from typing import Any, Dict, NamedTuple, Optional
 
 import serial
 import zigpy.exceptions
@@ -20,9 +23,36 @@ COMMAND_TIMEOUT = 1.5
 PROBE_TIMEOUT = 3.0
 DATA_CONFIRM_TIMEOUT = 7
 ACK_TIMEOUT = 7
+MAX_INFLIGHT_COMMANDS = 8
 
 SUCCESS = 0x00
 
+ZIGATE_EPOCH = datetime.datetime(2000, 1, 1)
+_ONE_SECOND = datetime.timedelta(seconds=1)
+
+_CHANNEL_MASKS = {channel: 1 << channel for channel in range(11, 27)}
+_CERTIFICATIONS = {'CE': 1, 'FCC': 2}
+
+
+@functools.lru_cache(maxsize=256)
+def _build_payload(cmd, args):
+    """Serialize the arguments tuple of a command
+
+    Most configuration commands are sent again and again with the same
+    arguments, so their payloads are cached.
+    """
+    return t.serialize(args, COMMANDS[cmd])
+
+
+def _channel_mask(channels=None):
+    channels = channels or [11, 14, 15, 19, 20, 24, 25, 26]
+    if not isinstance(channels, list):
+        channels = [channels]
+    mask = 0
+    for channel in channels:
+        mask ^= _CHANNEL_MASKS[channel]
+    return mask
+
 
 class CommandId(enum.IntEnum):
     SET_RAWMODE = 0x0002
@@ -139,6 +169,59 @@ COMMANDS = {
 }
 
 
+class StatusResponse(NamedTuple):
+    status: int
+    sqn: int
+    cmd: int
+    aps_sqn_exist: int
+    aps_sqn: Optional[int]
+    payload: Optional[bytes]
+
+
+class AckResponse(NamedTuple):
+    status: int
+    nwk: int
+    endpoint: int
+    cluster: int
+    aps_sqn: int
+
+
+# responses the driver itself reads, exposed with named fields
+RESPONSES_NAMED = {
+    ResponseId.STATUS: StatusResponse,
+    ResponseId.ACK_DATA: AckResponse,
+}
+
+_FIXED_FORMATS = {
+    t.uint8_t: 'B',
+    t.uint16_t: 'H',
+    t.uint32_t: 'I',
+    t.uint64_t: 'Q',
+    t.NWK: 'H',
+    t.EUI64: '8s',
+}
+
+
+def _eui64_from_bytes(value):
+    return t.EUI64(value[::-1])
+
+
+def _fixed_parser(schema):
+    """Return the struct and field converters for a fixed width schema, None otherwise"""
+    if not all(type_ in _FIXED_FORMATS for type_ in schema):
+        return None
+    unpacker = struct.Struct('!' + ''.join(_FIXED_FORMATS[type_] for type_ in schema))
+    converters = tuple(_eui64_from_bytes if type_ is t.EUI64 else type_ for type_ in schema)
+    return unpacker, converters
+
+
+RESPONSES_FAST = {
+    cmd: parser
+    for cmd, parser in ((cmd, _fixed_parser(schema)) for cmd, schema in RESPONSES.items())
+    if parser is not None
+}
+
+
 class AutoEnum(enum.IntEnum):
     def _generate_next_value_(name, start, count, last_values):
         return count
@@ -175,18 +258,106 @@ class CommandError(zigpy.exceptions.APIException):
     pass
 
 
+_STATUS = struct.Struct('!BBHBB')
+
+
+def _deserialize_response(cmd, data):
+    """Deserialize a response payload
+
+    Responses made of fixed width fields are unpacked at once instead of field
+    by field, status frames are the most frequent ones and only end with a
+    variable payload.
+    """
+    if cmd == ResponseId.STATUS and len(data) >= _STATUS.size:
+        payload = data[_STATUS.size:]
+        return StatusResponse(*_STATUS.unpack_from(data), t.Bytes(payload) if payload else None)
+    fast = RESPONSES_FAST.get(cmd)
+    if fast is not None and len(data) >= fast[0].size:
+        unpacker, converters = fast
+        data = [convert(value) for convert, value in zip(converters, unpacker.unpack_from(data))]
+    else:
+        data, rest = t.deserialize(data, RESPONSES[cmd])
+    named = RESPONSES_NAMED.get(cmd)
+    if named is not None:
+        return named._make(data)
+    return data
+
+
+class _Inflight:
+    """Futures of a command waiting for its status, data confirm and ack
+
+    Data confirm and ack futures are only created once the status gives an APS SQN.
+    """
+    __slots__ = ('cmd', 'sqn', 'status', 'datasent', 'ack')
+
+    def __init__(self, cmd, loop):
+        self.cmd = cmd
+        self.sqn = None
+        self.status = loop.create_future()
+        self.datasent = None
+        self.ack = None
+
+    def done(self):
+        return self.status.done()
+
+    def set_sqn(self, sqn):
+        loop = self.status.get_loop()
+        self.sqn = sqn
+        self.datasent = loop.create_future()
+        self.ack = loop.create_future()
+
+
+if sys.version_info >= (3, 11):
+    async def _await_with_timeout(fut, timeout):
+        """Await fut, without wrapping it like asyncio.wait_for does"""
+        async with asyncio.timeout(timeout):
+            return await fut
+else:
+    def _await_with_timeout(fut, timeout):
+        return asyncio.wait_for(fut, timeout=timeout)
+
+
+def _add_waiter(waiters, key, fut):
+    """Queue a future waiting for a reply identified by key"""
+    waiters.setdefault(key, collections.deque()).append(fut)
+
+
+def _pop_waiter(waiters, key):
+    """Return the oldest pending future (or _Inflight) waiting for key, if any"""
+    queue = waiters.get(key)
+    while queue:
+        fut = queue.popleft()
+        if not fut.done():
+            return fut
+    return None
+
+
+def _remove_waiter(waiters, key, fut):
+    queue = waiters.get(key)
+    if queue and fut in queue:
+        queue.remove(fut)
+
+
 class ZiGate:
     def __init__(self, device_config: Dict[str, Any]):
         self._app = None
         self._config = device_config
         self._uart = None
         self._awaiting = {}
-        self._status_awaiting = {}
-        self._status_datasent_awaiting = {}
-        self._status_ack_awaiting = {}
-        self._lock = asyncio.Lock()
+        self._by_cmd = {}
+        self._by_sqn: Dict[int, _Inflight] = {}
+        self._inflight = asyncio.Semaphore(MAX_INFLIGHT_COMMANDS)
+        self._tx_buf = bytearray()
+        self._tx_scheduled = False
         self._conn_lost_task = None
         self._version = None
+        self._dispatch = {
+            ResponseId.STATUS: self._handle_status,
+            ResponseId.APS_DATA_CONFIRM: self._handle_datasent,
+            ResponseId.APS_DATA_CONFIRM_FAILED: self._handle_datasent,
+            ResponseId.ACK_DATA: self._handle_ack,
+            ResponseId.ZCL_EVENT: self._handle_zcl_error,
+        }
 
         self.network_state = None
         self.zigate_version = None
@@ -245,6 +416,8 @@ class ZiGate:
         )
 
     def close(self):
+        # frames of commands sent without waiting may not be written yet
+        self._flush_tx()
         if self._uart:
             self._uart.close()
             self._uart = None
@@ -258,162 +431,162 @@ class ZiGate:
         self._app = app
 
     def data_received(self, cmd, data, lqi):
-        LOGGER.debug("data received %s %s LQI:%s", hex(cmd),
-                     binascii.hexlify(data), lqi)
+        """Handle a frame payload, data is a bytes-like object only valid during the call"""
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            # data is a view into the reused RX buffer, format it now
+            LOGGER.debug("data received 0x%04x %s LQI:%s", cmd, binascii.hexlify(data).decode(), lqi)
+        if cmd == ResponseId.LOG_MESSAGE and self._app is None and not LOGGER.isEnabledFor(logging.DEBUG):
+            # firmware log messages, nobody to log or handle them
+            return
         if cmd not in RESPONSES:
             LOGGER.warning('Received unhandled response 0x%04x', cmd)
             return
-        data, rest = t.deserialize(data, RESPONSES[cmd])
-        if cmd == 0x8000:
-            status = data[0]
-            cmd_called = data[2]
-            sqn_exist = data[3]
-            sqn_aps = data[4] if sqn_exist != 0 else None
-            LOGGER.debug("data_received : status received %s status:0x%02x cmd:0x%04x sqn:%s", hex(cmd),status ,cmd_called ,sqn_aps)
-            if cmd_called in self._status_awaiting:
-                fut = self._status_awaiting.pop(cmd_called)
-                if sqn_aps is not None:
-                    self._status_datasent_awaiting[sqn_aps] = asyncio.Future()
-                    self._status_ack_awaiting[sqn_aps] = asyncio.Future()
-                fut.set_result((data, lqi))
-        if cmd in [0x8012, 0x8702]:
-            LOGGER.debug("data_received : data confirm received %s sqn:%s ", hex(cmd),  data[4])
-            if data[4] in self._status_datasent_awaiting: #looking for APS SQN
-                fut = self._status_datasent_awaiting[data[4]]
+        data = _deserialize_response(cmd, data)
+        handler = self._dispatch.get(cmd)
+        if handler is not None:
+            fut = handler(cmd, data)
+            if fut is not None:
                 fut.set_result((data, lqi))
-        if cmd == 0x8011:
-            LOGGER.debug("data_received : ack received %s sqn:%s ", hex(cmd),  data[4])
-            if data[4] in self._status_ack_awaiting: #looking for APS SQN
-                fut = self._status_ack_awaiting[data[4]]
-                fut.set_result((data, lqi))
-        if cmd == 0x9999:
-            LOGGER.error("data_received : error details received %s error:0x%02x ", hex(cmd),  data[0])
-        if cmd in self._awaiting:
+        fut = _pop_waiter(self._awaiting, cmd)
+        if fut is not None:
             LOGGER.debug("data_received : status received 0x%04x ", cmd)
-
-            fut = self._awaiting.pop(cmd)
             fut.set_result((data, lqi))
         self.handle_callback(cmd, data, lqi)
 
+    def _handle_status(self, cmd, data):
+        sqn_aps = data.aps_sqn if data.aps_sqn_exist != 0 else None
+        LOGGER.debug("data_received : status received 0x%04x status:0x%02x cmd:0x%04x sqn:%s", cmd, data.status, data.cmd, sqn_aps)
+        inflight = _pop_waiter(self._by_cmd, data.cmd)
+        if inflight is None:
+            return None
+        if sqn_aps is not None:
+            inflight.set_sqn(sqn_aps)
+            self._by_sqn[sqn_aps] = inflight
+        return inflight.status
+
+    def _handle_datasent(self, cmd, data):
+        LOGGER.debug("data_received : data confirm received 0x%04x sqn:%s ", cmd, data[4])
+        inflight = self._by_sqn.get(data[4])  # looking for APS SQN
+        if inflight is not None and not inflight.datasent.done():
+            return inflight.datasent
+        return None
+
+    def _handle_ack(self, cmd, data):
+        LOGGER.debug("data_received : ack received 0x%04x sqn:%s ", cmd, data.aps_sqn)
+        inflight = self._by_sqn.get(data.aps_sqn)  # looking for APS SQN
+        if inflight is not None and not inflight.ack.done():
+            return inflight.ack
+        return None
+
+    def _handle_zcl_error(self, cmd, data):
+        LOGGER.error("data_received : error details received 0x%04x error:0x%02x ", cmd, data[0])
+        return None
+
     async def command(self, cmd, data=b'', wait_response=None, wait_status=True,wait_for_datasent= False ,wait_for_ack=False ,timeout=COMMAND_TIMEOUT):
-        LOGGER.debug('command :cmd=0x%04x  wait_status=%s wait_for_datasent=%s wait_for_ack=%s', 
-                                cmd, wait_status, wait_for_datasent,wait_for_ack)
-
-        await self._lock.acquire()
-        tries = 1
-        result = None
-        status_fut = None
-        response_fut = None
-        sqn = None
-        status = 0
-        while tries > 0:
-            if self._uart is None:
-            # connection was lost
-                self._lock.release()
-                raise CommandError("API is not running")
-            if wait_status:
-                status_fut = asyncio.Future()
-                self._status_awaiting[cmd] = status_fut
-            if wait_response:
-                response_fut = asyncio.Future()
-                self._awaiting[wait_response] = response_fut
+        """Send a command and wait for its status, data confirm, ack and/or response.
+
+        Frames are queued in order, replies are matched by command id
+        (status, response) and by APS SQN (data confirm, ack), so up to
+        MAX_INFLIGHT_COMMANDS commands can wait for their replies concurrently.
+        The command is tried once, retrying is up to the caller.
+        """
+        LOGGER.debug('command :cmd=0x%04x  wait_status=%s wait_for_datasent=%s wait_for_ack=%s',
+                     cmd, wait_status, wait_for_datasent, wait_for_ack)
+
+        loop = asyncio.get_running_loop()
+        async with self._inflight:
+            result = None
+            inflight = None
+            response_fut = None
+            sqn = None
             status = SUCCESS
-            tries -= 1
-            self._uart.send(cmd, data)
-            if wait_status:
-                LOGGER.debug('command : Wait for status to command 0x%04x', cmd)
-                try:
-                    result = await asyncio.wait_for(status_fut, timeout=timeout)
-                    data,lqi = result
-                    status = data[0]
-                    sqn_exist = data[3]
-
-                    if sqn_exist != 0 :
-                        sqn = data[4]
-                        datasent_fut = self._status_datasent_awaiting[sqn]
-                        ack_fut = self._status_ack_awaiting[sqn]
-                        if not wait_for_datasent:
-                            del self._status_datasent_awaiting[sqn]
-                        if not wait_for_ack :
-                            del self._status_ack_awaiting[sqn]
-                    LOGGER.debug('command : Got status for 0x%04x : sqn:%s', cmd, sqn)
-                except asyncio.TimeoutError:
-                    if cmd in self._status_awaiting:
-                        del self._status_awaiting[cmd]
-                    if response_fut and wait_response in self._awaiting:
-                        del self._awaiting[wait_response]
-                    LOGGER.warning("No response to command 0x%04x", cmd)
-                    LOGGER.debug('Tries count %s', tries)
-                    if tries > 0:
-                        LOGGER.warning("Retry command 0x%04x", cmd)
-                        continue
-                    else:
-                        self._lock.release()
-                        raise NoStatusError
-            if (status == SUCCESS ) and wait_for_datasent and (sqn is not None):
-                LOGGER.debug('command : Wait for data sent for command 0x%04x sqn:%d', cmd,sqn)
-                try:
-                    result = await asyncio.wait_for(datasent_fut, timeout=DATA_CONFIRM_TIMEOUT)
-                    self._status_datasent_awaiting.pop(sqn)
-                    data,lqi = result
-                    sqn=data[4]
-                    status = data[0]
-                    LOGGER.debug('command : Got data sent info for 0x%04x : sqn:%s', cmd, sqn)
-                except asyncio.TimeoutError:
-                    LOGGER.warning("No data confirm for command 0x%04x", cmd)
-                    if sqn in self._status_datasent_awaiting:
-                        del self._status_datasent_awaiting[sqn]
-                    if tries > 0:
-                        LOGGER.warning("Retry command 0x%04x", cmd)
-                        continue
-                    else:
-                        self._lock.release()
+            try:
+                # no await between registering the replies and queuing the frame,
+                # so no other command can interleave here
+                if self._uart is None:
+                    # connection was lost
+                    raise CommandError("API is not running")
+                if wait_status:
+                    inflight = _Inflight(cmd, loop)
+                    _add_waiter(self._by_cmd, cmd, inflight)
+                if wait_response:
+                    response_fut = loop.create_future()
+                    _add_waiter(self._awaiting, wait_response, response_fut)
+                self._queue_frame(zigpy_zigate.uart.frame(cmd, data))
+
+                if wait_status:
+                    LOGGER.debug('command : Wait for status to command 0x%04x', cmd)
+                    try:
+                        result = await _await_with_timeout(inflight.status, timeout)
+                    except asyncio.TimeoutError:
+                        LOGGER.warning("No response to command 0x%04x", cmd)
                         raise NoStatusError
+                    data, lqi = result
+                    status = data.status
+                    if data.aps_sqn_exist != 0:
+                        sqn = data.aps_sqn
+                    LOGGER.debug('command : Got status for 0x%04x : sqn:%s', cmd, sqn)
 
-            if (status == SUCCESS ) and wait_for_ack and (sqn is not None):
-                LOGGER.debug('command : Wait for ack for command 0x%04x sqn:%d', cmd, sqn)
-                try:
-                    result = await asyncio.wait_for(ack_fut, timeout=ACK_TIMEOUT)
-                    self._status_ack_awaiting.pop(sqn)
-                    data,lqi = result
-                    sqn=data[4] 
+                if (status == SUCCESS) and wait_for_datasent and (sqn is not None):
+                    LOGGER.debug('command : Wait for data sent for command 0x%04x sqn:%d', cmd, sqn)
+                    try:
+                        result = await _await_with_timeout(inflight.datasent, DATA_CONFIRM_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        LOGGER.warning("No data confirm for command 0x%04x", cmd)
+                        raise NoStatusError
+                    data, lqi = result
                     status = data[0]
-                    LOGGER.debug('command : Got ack for 0x%04x : %s', cmd, sqn)
-                except asyncio.TimeoutError:
-                    if sqn in self._status_ack_awaiting:
-                        del self._status_ack_awaiting[sqn]
-                    if tries > 0:
-                        LOGGER.warning("Retry command 0x%04x", cmd)
-                        continue
-                    else:
-                        self._lock.release()
+                    LOGGER.debug('command : Got data sent info for 0x%04x : sqn:%s', cmd, data[4])
+
+                if (status == SUCCESS) and wait_for_ack and (sqn is not None):
+                    LOGGER.debug('command : Wait for ack for command 0x%04x sqn:%d', cmd, sqn)
+                    try:
+                        result = await _await_with_timeout(inflight.ack, ACK_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        LOGGER.warning("No ack for command 0x%04x", cmd)
                         raise NoStatusError
-
-            if (status == SUCCESS ) and (wait_response):
-                LOGGER.debug('command : Wait for response 0x%04x', wait_response)
-                try:
-                    result = await asyncio.wait_for(response_fut, timeout=timeout)
-                    data,lqi = result
+                    data, lqi = result
+                    status = data.status
+                    LOGGER.debug('command : Got ack for 0x%04x : %s', cmd, data.aps_sqn)
+
+                if (status == SUCCESS) and (wait_response):
+                    LOGGER.debug('command : Wait for response 0x%04x', wait_response)
+                    try:
+                        result = await _await_with_timeout(response_fut, timeout)
+                    except asyncio.TimeoutError:
+                        LOGGER.warning("No response waiting for 0x%04x", wait_response)
+                        raise NoResponseError
                     LOGGER.debug('command : Got response 0x%04x : %s', wait_response, result)
                     #status = data[0] some response do not have a status eg: 0x8010
-                except asyncio.TimeoutError:
-                    if wait_response in self._awaiting:
-                        del self._awaiting[wait_response]
-                    LOGGER.warning("No response waiting for 0x%04x", wait_response)
-                    LOGGER.debug('Tries count %s', tries)
-                    if tries > 0:
-                        LOGGER.warning("Retry command 0x%04x", cmd)
-                        continue
-                    else:
-                        self._lock.release()
-                        raise NoResponseError
+            finally:
+                # drop whatever is still registered for this command, e.g. on timeout
+                # or cancellation, so late replies are not matched to another command
+                if inflight is not None:
+                    _remove_waiter(self._by_cmd, cmd, inflight)
+                    if inflight.sqn is not None and self._by_sqn.get(inflight.sqn) is inflight:
+                        del self._by_sqn[inflight.sqn]
+                if response_fut is not None:
+                    _remove_waiter(self._awaiting, wait_response, response_fut)
+
         if status in [0xA3, 0xA6, 0xC2]:
-            LOGGER.error("command : error status cmd:%s error:%d", hex(cmd), status)
+            LOGGER.error("command : error status cmd:0x%04x error:%d", cmd, status)
             #wait got 9999 if status  0xA3 0xA6 0xC2
         LOGGER.debug("command : end command cmd:0x%04x result:%s", cmd, result)
-        self._lock.release()
         return result
 
+    def _queue_frame(self, frame):
+        """Queue a frame, frames queued during the same loop iteration are written at once"""
+        self._tx_buf += frame
+        if not self._tx_scheduled:
+            self._tx_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush_tx)
+
+    def _flush_tx(self):
+        self._tx_scheduled = False
+        if self._tx_buf and self._uart is not None:
+            self._uart.write(bytes(self._tx_buf))
+        self._tx_buf.clear()
+
     async def version(self):
         if self._version is None:
             self._version = await self.command(0x0010, wait_response=0x8010)
@@ -434,7 +607,7 @@ class ZiGate:
         return await self.command(0x0009, wait_response=0x8009)
 
     async def set_raw_mode(self, enable=True):
-        data = t.serialize([enable], COMMANDS[0x0002])
+        data = _build_payload(0x0002, (enable,))
         await self.command(0x0002, data)
 
     async def reset(self):
@@ -448,25 +621,24 @@ class ZiGate:
         if timestamp is None, now is used
         """
         dt = dt or datetime.datetime.now()
-        timestamp = int((dt - datetime.datetime(2000, 1, 1)).total_seconds())
+        timestamp = (dt - ZIGATE_EPOCH) // _ONE_SECOND
         data = t.serialize([timestamp], COMMANDS[0x0016])
         await self.command(0x0016, data)
 
     async def get_time_server(self):
         timestamp, lqi = await self.command(0x0017, wait_response=0x8017)
-        return datetime.datetime(2000, 1, 1) + datetime.timedelta(seconds=timestamp[0])
+        return ZIGATE_EPOCH + datetime.timedelta(seconds=timestamp[0])
 
     async def set_led(self, enable=True):
-        data = t.serialize([enable], COMMANDS[0x0018])
+        data = _build_payload(0x0018, (enable,))
         await self.command(0x0018, data)
 
     async def set_certification(self, typ='CE'):
-        cert = {'CE': 1, 'FCC': 2}[typ]
-        data = t.serialize([cert], COMMANDS[0x0019])
+        cert = _CERTIFICATIONS[typ]
+        data = _build_payload(0x0019, (cert,))
         await self.command(0x0019, data)
 
     async def management_network_request(self):
-        data = t.serialize([0x0000, 0x07fff800, 0xff, 5, 0xff, 0x0000], COMMANDS[0x004a])
         return await self.command(0x004a)#, wait_response=0x804a, timeout=10)
 
     async def set_tx_power(self, power=63):
@@ -475,24 +647,40 @@ class ZiGate:
             return
         power = min(power, 63)
         power = max(power, 0)
-        data = t.serialize([power], COMMANDS[0x0806])
+        data = _build_payload(0x0806, (power,))
         power, lqi = await self.command(0x0806, data, wait_response=0x8806)
         return power[0]
 
     async def set_channel(self, channels=None):
-        channels = channels or [11, 14, 15, 19, 20, 24, 25, 26]
-        if not isinstance(channels, list):
-            channels = [channels]
-        mask = functools.reduce(lambda acc, x: acc ^ 2 ** x, channels, 0)
-        data = t.serialize([mask], COMMANDS[0x0021])
+        data = _build_payload(0x0021, (_channel_mask(channels),))
         await self.command(0x0021, data),
 
     async def set_extended_panid(self, extended_pan_id):
         data = t.serialize([extended_pan_id], COMMANDS[0x0020])
         await self.command(0x0020, data)
 
+    async def configure_batch(self, *, raw_mode=True, led=True, cert='CE', channels=None,
+                              ext_panid=None, tx_power=63):
+        """Reset the ZiGate then send the configuration commands without waiting for each other
+
+        The extended PAN ID and the TX power are left untouched when None.
+        """
+        commands = [
+            (0x0002, _build_payload(0x0002, (raw_mode,))),
+            (0x0018, _build_payload(0x0018, (led,))),
+            (0x0019, _build_payload(0x0019, (_CERTIFICATIONS[cert],))),
+            (0x0021, _build_payload(0x0021, (_channel_mask(channels),))),
+        ]
+        if ext_panid is not None:
+            commands.append((0x0020, t.serialize([ext_panid], COMMANDS[0x0020])))
+        await self.reset()
+        pending = [self.command(cmd, data) for cmd, data in commands]
+        if tx_power is not None:
+            pending.append(self.set_tx_power(tx_power))
+        await asyncio.gather(*pending)
+
     async def permit_join(self, duration=60):
-        data = t.serialize([0xfffc, duration, 0], COMMANDS[0x0049])
+        data = _build_payload(0x0049, (0xfffc, duration, 0))
         return await self.command(0x0049, data,wait_for_datasent=False)
 
     async def start_network(self):
@@ -1,3 +1,4 @@
+import binascii
 import re
 import os.path
 import serial.tools.list_ports
@@ -5,10 +6,44 @@ import serial
 import usb
 import logging
 import asyncio
+import functools
 
 LOGGER = logging.getLogger(__name__)
 
 
+class LazyHex:
+    """ hex representation of data, only computed if the log record is emitted
+
+    data must not change afterwards, do not use it on views of reused buffers
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return binascii.hexlify(self.data).decode()
+
+
+def run(main, use_uvloop=False):
+    """ run the main coroutine, on an uvloop event loop if requested
+
+    the default event loop is used when uvloop is not installed
+    (uvloop is not available on Windows)
+    """
+    if use_uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            LOGGER.warning('uvloop not available, using default event loop')
+        else:
+            if hasattr(asyncio, 'Runner'):
+                with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+                    return runner.run(main)
+            return uvloop.run(main)
+    return asyncio.run(main)
+
+
 def discover_port():
     """ discover zigate port """
     devices = list(serial.tools.list_ports.grep('ZiGate'))
@@ -102,16 +137,28 @@ def ftdi_set_bitmode(dev, bitmask):
     dev.ctrl_transfer(bmRequestType, SIO_SET_BITMODE_REQUEST, wValue)
 
 
+async def _find_zigatedin():
+    """Find ZiGate DIN FTDI chip, without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(usb.core.find, idVendor=0x0403, idProduct=0x6001))
+
+
+async def _ftdi_set_bitmode(dev, bitmask):
+    """Run the blocking USB control transfer in the executor"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, ftdi_set_bitmode, dev, bitmask)
+
+
 async def set_zigatedin_running_mode():
     try:
-        dev = usb.core.find(idVendor=0x0403, idProduct=0x6001)
+        dev = await _find_zigatedin()
         if not dev:
             LOGGER.error('ZiGate DIN not found.')
             return
         LOGGER.info('Put ZiGate DIN in running mode')
-        ftdi_set_bitmode(dev, 0xC8)
+        await _ftdi_set_bitmode(dev, 0xC8)
         await asyncio.sleep(0.5)
-        ftdi_set_bitmode(dev, 0xCC)
+        await _ftdi_set_bitmode(dev, 0xCC)
         await asyncio.sleep(0.5)
     except Exception as e:
         LOGGER.error('Unable to set FTDI bitmode, please check configuration')
@@ -120,20 +167,20 @@ async def set_zigatedin_running_mode():
 
 async def set_zigatedin_flashing_mode():
     try:
-        dev = usb.core.find(idVendor=0x0403, idProduct=0x6001)
+        dev = await _find_zigatedin()
         if not dev:
             LOGGER.error('ZiGate DIN not found.')
             return
         LOGGER.info('Put ZiGate DIN in flashing mode')
-        ftdi_set_bitmode(dev, 0x00)
+        await _ftdi_set_bitmode(dev, 0x00)
         await asyncio.sleep(0.5)
-        ftdi_set_bitmode(dev, 0xCC)
+        await _ftdi_set_bitmode(dev, 0xCC)
         await asyncio.sleep(0.5)
-        ftdi_set_bitmode(dev, 0xC0)
+        await _ftdi_set_bitmode(dev, 0xC0)
         await asyncio.sleep(0.5)
-        ftdi_set_bitmode(dev, 0xC4)
+        await _ftdi_set_bitmode(dev, 0xC4)
         await asyncio.sleep(0.5)
-        ftdi_set_bitmode(dev, 0xCC)
+        await _ftdi_set_bitmode(dev, 0xCC)
         await asyncio.sleep(0.5)
     except Exception as e:
         LOGGER.error('Unable to set FTDI bitmode, please check configuration')
@@ -7,11 +7,11 @@ import asyncio
 import logging
 from os import wait
 from zigpy_zigate.api import LOGGER, ZiGate, NoResponseError, CommandError
+import zigpy_zigate.common
 import zigpy_zigate.config
 
 
-async def main():
-    logging.basicConfig(level=logging.INFO)
+def parse_args(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("command", help="Command to start",
                         choices=["version", "reset", "erase_persistent",
@@ -19,8 +19,13 @@ async def main():
                                  "loop"])
     parser.add_argument("-p", "--port", help="Port", default='auto')
     parser.add_argument("-d", "--debug", help="Debug log", action='store_true')
+    parser.add_argument("--uvloop", help="Use uvloop event loop if installed", action='store_true')
     parser.add_argument("-v", "--value", help="Set command's value")
-    args = parser.parse_args()
+    return parser.parse_args(argv)
+
+
+async def main(args):
+    logging.basicConfig(level=logging.INFO)
     print('Port set to', args.port)
     if args.debug:
         logging.root.setLevel(logging.DEBUG)
@@ -76,4 +81,5 @@ async def main():
     api.close()
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    args = parse_args()
+    zigpy_zigate.common.run(main(args), use_uvloop=args.uvloop)
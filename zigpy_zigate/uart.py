@@ -13,14 +13,71 @@ from . import common as c
 
 LOGGER = logging.getLogger(__name__)
 ZIGATE_BAUDRATE = 115200
+RX_BUFFER_SIZE = 512
+
+
+START = b'\x01'
+END = b'\x03'
+_HEADER = struct.Struct('!HHB')
+
+
+def _escape(data):
+    ret = []
+    for b in data:
+        if b < 0x10:
+            ret.extend([0x02, 0x10 ^ b])
+        else:
+            ret.append(b)
+    return bytes(ret)
+
+
+def _checksum(*args):
+    chcksum = 0
+    for arg in args:
+        if isinstance(arg, int):
+            chcksum ^= arg
+            continue
+        for x in arg:
+            chcksum ^= x
+    return chcksum
+
+
+def _unescape_into(data, buf):
+    """Unescape data into buf, return the unescaped length"""
+    chunks = data.split(b'\x02')
+    length = len(chunks[0])
+    buf[:length] = chunks[0]
+    for chunk in chunks[1:]:
+        if chunk:
+            buf[length] = chunk[0] ^ 0x10
+            buf[length + 1:length + len(chunk)] = chunk[1:]
+            length += len(chunk)
+    return length
+
+
+def frame(cmd, data=b''):
+    """Return the escaped frame, start and end bytes included, for a command"""
+    LOGGER.debug("Send: 0x%04x %s", cmd, c.LazyHex(data))
+    length = len(data)
+    byte_head = struct.pack('!HH', cmd, length)
+    checksum = _checksum(byte_head, data)
+    raw = struct.pack('!HHB%ds' % length, cmd, length, checksum, data)
+    LOGGER.debug('Frame to send: %s', raw)
+    raw = _escape(raw)
+    LOGGER.debug('Frame escaped: %s', raw)
+    return START + raw + END
 
 
 class Gateway(asyncio.Protocol):
-    START = b'\x01'
-    END = b'\x03'
+    START = START
+    END = END
+
+    _escape = staticmethod(_escape)
+    _checksum = staticmethod(_checksum)
 
     def __init__(self, api, connected_future=None):
-        self._buffer = b''
+        self._buffer = bytearray()
+        self._rx_scratch = bytearray(RX_BUFFER_SIZE)
         self._connected_future = connected_future
         self._api = api
 
@@ -51,15 +108,11 @@ class Gateway(asyncio.Protocol):
 
     def send(self, cmd, data=b''):
         """Send data, taking care of escaping and framing"""
-        LOGGER.debug("Send: 0x%04x %s", cmd, binascii.hexlify(data))
-        length = len(data)
-        byte_head = struct.pack('!HH', cmd, length)
-        checksum = self._checksum(byte_head, data)
-        frame = struct.pack('!HHB%ds' % length, cmd, length, checksum, data)
-        LOGGER.debug('Frame to send: %s', frame)
-        frame = self._escape(frame)
-        LOGGER.debug('Frame escaped: %s', frame)
-        self._transport.write(self.START + frame + self.END)
+        self._transport.write(frame(cmd, data))
+
+    def write(self, data):
+        """Write already framed data"""
+        self._transport.write(data)
 
     def data_received(self, data):
         """Callback when there is data received from the uart"""
@@ -69,30 +122,44 @@ class Gateway(asyncio.Protocol):
         while endpos != -1:
             startpos = self._buffer.rfind(self.START, 0, endpos)
             if startpos != -1 and startpos < endpos:
-                frame = self._buffer[startpos:endpos + 1]
-                frame = self._unescape(frame[1:-1])
-                cmd, length, checksum, f_data, lqi = struct.unpack('!HHB%dsB' % (len(frame) - 6), frame)
-                if self._length(frame) != length:
-                    LOGGER.warning("Invalid length: %s, data: %s",
-                                   length,
-                                   len(frame) - 6)
-                    self._buffer = self._buffer[endpos + 1:]
-                    endpos = self._buffer.find(self.END)
-                    continue
-                if self._checksum(frame[:4], lqi, f_data) != checksum:
-                    LOGGER.warning("Invalid checksum: %s, data: 0x%s",
-                                   checksum,
-                                   binascii.hexlify(frame).decode())
-                    self._buffer = self._buffer[endpos + 1:]
-                    endpos = self._buffer.find(self.END)
-                    continue
-                LOGGER.debug("Frame received: %s", binascii.hexlify(frame).decode())
-                self._api.data_received(cmd, f_data, lqi)
+                self._frame_received(self._buffer[startpos + 1:endpos])
             else:
                 LOGGER.warning('Malformed packet received, ignore it')
-            self._buffer = self._buffer[endpos + 1:]
+            del self._buffer[:endpos + 1]
             endpos = self._buffer.find(self.END)
 
+    def _frame_received(self, data):
+        """Check and forward an escaped frame, without start and end bytes
+
+        The frame is unescaped into a preallocated buffer and its payload is
+        handed to the api as a memoryview of that buffer, which is only valid
+        for the duration of the call.
+        """
+        if len(data) <= len(self._rx_scratch):
+            frame = memoryview(self._rx_scratch)[:_unescape_into(data, self._rx_scratch)]
+        else:
+            frame = memoryview(self._unescape(data))
+        if len(frame) < 6:
+            LOGGER.warning("Invalid length: frame too short %s", len(frame))
+            return
+        cmd, length, checksum = _HEADER.unpack_from(frame)
+        f_data = frame[5:-1]
+        lqi = frame[-1]
+        if self._length(frame) != length:
+            LOGGER.warning("Invalid length: %s, data: %s",
+                           length,
+                           len(frame) - 6)
+            return
+        if self._checksum(frame[:4], lqi, f_data) != checksum:
+            LOGGER.warning("Invalid checksum: %s, data: 0x%s",
+                           checksum,
+                           binascii.hexlify(frame).decode())
+            return
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            # frame is a view into the reused RX buffer, format it now
+            LOGGER.debug("Frame received: %s", binascii.hexlify(frame).decode())
+        self._api.data_received(cmd, f_data, lqi)
+
     def _unescape(self, data):
         flip = False
         ret = []
@@ -106,25 +173,6 @@ class Gateway(asyncio.Protocol):
                 ret.append(b)
         return bytes(ret)
 
-    def _escape(self, data):
-        ret = []
-        for b in data:
-            if b < 0x10:
-                ret.extend([0x02, 0x10 ^ b])
-            else:
-                ret.append(b)
-        return bytes(ret)
-
-    def _checksum(self, *args):
-        chcksum = 0
-        for arg in args:
-            if isinstance(arg, int):
-                chcksum ^= arg
-                continue
-            for x in arg:
-                chcksum ^= x
-        return chcksum
-
     def _length(self, frame):
         length = len(frame) - 5
         return length
@@ -134,7 +182,7 @@ async def connect(device_config: Dict[str, Any], api, loop=None):
     if loop is None:
         loop = asyncio.get_event_loop()
 
-    connected_future = asyncio.Future()
+    connected_future = loop.create_future()
     protocol = Gateway(api, connected_future)
 
     port = device_config[CONF_DEVICE_PATH]
@@ -1,5 +1,7 @@
 import asyncio
+import collections
 import logging
+import struct
 from typing import Any, Dict, Optional
 
 import zigpy.application
@@ -12,12 +14,23 @@ import zigpy.exceptions
 
 from zigpy_zigate import types as t
 from zigpy_zigate import common as c
-from zigpy_zigate.api import NoResponseError, ZiGate, PDM_EVENT
+from zigpy_zigate.api import NoResponseError, ZiGate, PDM_EVENT, ResponseId
 from zigpy_zigate.config import CONF_DEVICE, CONF_DEVICE_PATH, CONFIG_SCHEMA, SCHEMA_DEVICE, CONF_NWK, CONF_NWK_EXTENDED_PAN_ID
 
 LOGGER = logging.getLogger(__name__)
 ZDO_PROFILE = 0x0000
 ZDO_ENDPOINT = 0
+# ZDO Device_annce payload
+_DEVICE_ANNOUNCE = struct.Struct('<BH8sB')
+# Bound once for the callback handlers
+_NWK = zigpy.types.NWK
+_EUI64 = zigpy.types.EUI64
+_ADDR_MODE_NWK = t.ADDRESS_MODE.NWK
+_ADDR_MODE_IEEE = t.ADDRESS_MODE.IEEE
+# Max number of interned EUI64 addresses
+EUI64_INTERN_SIZE = 1024
+# Backoff between network state polls while the network forms, about 3s overall
+FORMATION_RETRY_DELAYS = (0.1, 0.25, 0.6, 1.0, 1.0)
 
 
 class ControllerApplication(zigpy.application.ControllerApplication):
@@ -30,24 +43,58 @@ class ControllerApplication(zigpy.application.ControllerApplication):
         super().__init__(zigpy.config.ZIGPY_SCHEMA(config))
         self._api: Optional[ZiGate] = None
 
-        self._pending = {}
+        self._pending: Dict[int, asyncio.Future] = {}
         self._pending_join = []
+        self._nwk_to_device: Dict[int, zigpy.device.Device] = {}
+        self._eui_intern = collections.OrderedDict()
+        self._msg_handlers = {
+            ResponseId.LEAVE_INDICATION: self._handle_leave,
+            ResponseId.DEVICE_ANNOUNCE: self._handle_join,
+            ResponseId.DATA_INDICATION: self._handle_apsdu,
+            ResponseId.ACK_DATA: self._handle_ack_data,
+            ResponseId.APS_DATA_CONFIRM: self._handle_zps_event,
+            ResponseId.PDM_EVENT: self._handle_pdm_event,
+            ResponseId.APS_DATA_CONFIRM_FAILED: self._handle_aps_fail,
+            ResponseId.ZCL_EVENT: self._handle_zcl_event,
+        }
 
         self.version = ''
+        self._version_tuple = (0, 0)
+        self._device_model_prefix = None
 
     async def connect(self):
         api = await ZiGate.new(self._config[CONF_DEVICE], self)
-        await api.set_raw_mode()
-        await api.set_time()
-        version, lqi = await api.version()
+        # commands are pipelined by the api, frames still go out in this order
+        _, _, (version, lqi) = await asyncio.gather(
+            api.set_raw_mode(), api.set_time(), api.version()
+        )
 
         hex_version = f"{version[1]:x}"
         self.version = f"{hex_version[0]}.{hex_version[1:]}"
+        self._version_tuple = (version[1] >> 8, version[1] & 0xFF)
+        self._device_model_prefix = self._probe_device_model()
         self._api = api
 
-        if self.version < '3.21':
+        if self._version_tuple < (3, 0x21):
             LOGGER.warning('Old ZiGate firmware detected, you should upgrade to 3.21 or newer')
 
+    def _probe_device_model(self):
+        port = self._config[CONF_DEVICE][CONF_DEVICE_PATH]
+        if c.is_zigate_wifi(port):
+            return 'ZiGate WiFi'
+        elif c.is_pizigate(port):
+            return 'PiZiGate'
+        elif c.is_zigate_din(port):
+            return 'ZiGate USB-DIN'
+        return 'ZiGate USB-TTL'
+
+    @property
+    def device_model_prefix(self):
+        """ZiGate hardware model, probed from the port once"""
+        if self._device_model_prefix is None:
+            self._device_model_prefix = self._probe_device_model()
+        return self._device_model_prefix
+
     async def disconnect(self):
         # TODO: how do you stop the network? Is it possible?
         await self._api.reset()
@@ -101,13 +148,14 @@ class ControllerApplication(zigpy.application.ControllerApplication):
             return
 
         LOGGER.warning('Starting network got status %s, wait...', network_formed[0])
-        for attempt in range(3):
-            await asyncio.sleep(1)
+        for attempt, delay in enumerate(FORMATION_RETRY_DELAYS, 1):
+            await asyncio.sleep(delay)
 
             try:
                 await self.load_network_info()
+                return
             except zigpy.exceptions.NetworkNotFormed as e:
-                if attempt == 2:
+                if attempt == len(FORMATION_RETRY_DELAYS):
                     raise zigpy.exceptions.FormationFailure() from e
 
     async def permit_with_key(self, node, code, time_s = 60):
@@ -118,89 +166,132 @@ class ControllerApplication(zigpy.application.ControllerApplication):
         await self._api.remove_device(self.state.node_info.ieee, dev.ieee)
 
 
+    def handle_join(self, nwk, ieee, parent_nwk, *args, **kwargs):
+        super().handle_join(nwk, ieee, parent_nwk, *args, **kwargs)
+        device = self.devices.get(ieee)
+        if device is not None:
+            self._nwk_to_device[nwk] = device
+
+    def handle_leave(self, nwk, ieee):
+        super().handle_leave(nwk, ieee)
+        for cached_nwk, device in list(self._nwk_to_device.items()):
+            if device.ieee == ieee:
+                del self._nwk_to_device[cached_nwk]
+
+    def _get_device_by_nwk(self, nwk):
+        """Cached get_device(nwk=...), zigpy looks the NWK address up with a linear scan"""
+        device = self._nwk_to_device.get(nwk)
+        if device is None or device.nwk != nwk or self.devices.get(device.ieee) is not device:
+            # not cached yet, or the device changed address or was removed
+            device = self.get_device(nwk=nwk)
+            self._nwk_to_device[nwk] = device
+        return device
+
+    def _intern_eui(self, raw):
+        """Return a shared EUI64 for the given address bytes"""
+        key = bytes(raw)
+        eui = self._eui_intern.get(key)
+        if eui is None:
+            eui = self._eui_intern[key] = _EUI64(raw)
+            if len(self._eui_intern) > EUI64_INTERN_SIZE:
+                self._eui_intern.popitem(last=False)
+        else:
+            # least recently seen addresses are evicted first
+            self._eui_intern.move_to_end(key)
+        return eui
+
     def zigate_callback_handler(self, msg, response, lqi):
-        LOGGER.debug('zigate_callback_handler {}'.format(response))
-
-        if msg == 0x8048:  # leave
-            nwk = 0
-            ieee = zigpy.types.EUI64(response[0])
-            self.handle_leave(nwk, ieee)
-        elif msg == 0x004D:  # join
-            if lqi != 0 :
-                nwk = zigpy.types.NWK(response[0])
-                ieee = zigpy.types.EUI64(response[1])
-                parent_nwk = 0
-                self.handle_join(nwk, ieee, parent_nwk)
-                device = self.get_device(ieee=ieee)
-                rssi = 0
-                device.radio_details(lqi, rssi)
-                data = t.uint8_t (0x00).serialize() #sqn 
-                data += nwk.serialize() # nwk
-                data += ieee.serialize() # ieee
-                data += response[2].serialize() #mac cap
-
-                self.handle_message(
-                    device,
-                    profile=ZDO_PROFILE,
-                    cluster=0x0013,
-                    src_ep=ZDO_ENDPOINT,
-                    dst_ep=ZDO_ENDPOINT,
-                    message=data ,
-                )                
-            # Temporary disable two stages pairing due to firmware bug
-            # rejoin = response[3]
-            # if nwk in self._pending_join or rejoin:
-            #     LOGGER.debug('Finish pairing {} (2nd device announce)'.format(nwk))
-            #     if nwk in self._pending_join:
-            #         self._pending_join.remove(nwk)
-            #     self.handle_join(nwk, ieee, parent_nwk)
-            # else:
-            #     LOGGER.debug('Start pairing {} (1st device announce)'.format(nwk))
-            #     self._pending_join.append(nwk)
-        elif msg == 0x8002:
-            if response[1] == 0x0 and response[2] == 0x13:
-                nwk = zigpy.types.NWK(response[5].address)
-                ieee = zigpy.types.EUI64(response[7][3:11])
-                parent_nwk = 0
-                self.handle_join(nwk, ieee, parent_nwk)
-                return
-            try:
-                if response[5].address_mode == t.ADDRESS_MODE.NWK:
-                    device = self.get_device(nwk = zigpy.types.NWK(response[5].address))
-                elif response[5].address_mode == t.ADDRESS_MODE.IEEE:
-                    device = self.get_device(ieee=zigpy.types.EUI64(response[5].address))
-                else:
-                    LOGGER.error("No such device %s", response[5].address)
-                    return
-            except KeyError:
-                LOGGER.debug("No such device %s", response[5].address)
-                return
+        LOGGER.debug('zigate_callback_handler %s', response)
+
+        handler = self._msg_handlers.get(msg)
+        if handler is not None:
+            handler(response, lqi)
+
+    def _handle_leave(self, response, lqi):
+        nwk = 0
+        ieee = self._intern_eui(response[0])
+        self.handle_leave(nwk, ieee)
+
+    def _handle_join(self, response, lqi):
+        if lqi != 0 :
+            nwk = _NWK(response[0])
+            ieee = self._intern_eui(response[1])
+            parent_nwk = 0
+            self.handle_join(nwk, ieee, parent_nwk)
+            device = self.get_device(ieee=ieee)
             rssi = 0
             device.radio_details(lqi, rssi)
-            self.handle_message(device, response[1],
-                                response[2],
-                                response[3], response[4], response[-1])
-        elif msg == 0x8011:  # ACK Data
-            LOGGER.debug('ACK Data received %s %s', response[4], response[0])
-            # disabled because of https://github.com/fairecasoimeme/ZiGate/issues/324
-            # self._handle_frame_failure(response[4], response[0])
-        elif msg == 0x8012:  # ZPS Event
-            LOGGER.debug('ZPS Event APS data confirm, message routed to %s %s', response[3], response[0])
-        elif msg == 0x8035:  # PDM Event
-            try:
-                event = PDM_EVENT(response[0]).name
-            except ValueError:
-                event = 'Unknown event'
-            LOGGER.debug('PDM Event %s %s, record %s', response[0], event, response[1])
-        elif msg == 0x8702:  # APS Data confirm Fail
-            LOGGER.debug('APS Data confirm Fail %s %s', response[4], response[0])
-            self._handle_frame_failure(response[4], response[0])
-        elif msg == 0x9999:  # ZCL event
-            LOGGER.warning('Extended error code %s', response[0])
+            # sqn, nwk, ieee, mac cap
+            data = _DEVICE_ANNOUNCE.pack(0x00, nwk, ieee.serialize(), response[2])
+
+            self.handle_message(
+                device,
+                profile=ZDO_PROFILE,
+                cluster=0x0013,
+                src_ep=ZDO_ENDPOINT,
+                dst_ep=ZDO_ENDPOINT,
+                message=data ,
+            )                
+        # Temporary disable two stages pairing due to firmware bug
+        # rejoin = response[3]
+        # if nwk in self._pending_join or rejoin:
+        #     LOGGER.debug('Finish pairing {} (2nd device announce)'.format(nwk))
+        #     if nwk in self._pending_join:
+        #         self._pending_join.remove(nwk)
+        #     self.handle_join(nwk, ieee, parent_nwk)
+        # else:
+        #     LOGGER.debug('Start pairing {} (1st device announce)'.format(nwk))
+        #     self._pending_join.append(nwk)
+
+    def _handle_apsdu(self, response, lqi):
+        if response[1] == 0x0 and response[2] == 0x13:
+            nwk = _NWK(response[5].address)
+            ieee = self._intern_eui(response[7][3:11])
+            parent_nwk = 0
+            self.handle_join(nwk, ieee, parent_nwk)
+            return
+        try:
+            if response[5].address_mode == _ADDR_MODE_NWK:
+                device = self._get_device_by_nwk(_NWK(response[5].address))
+            elif response[5].address_mode == _ADDR_MODE_IEEE:
+                device = self.get_device(ieee=self._intern_eui(response[5].address))
+            else:
+                LOGGER.error("No such device %s", response[5].address)
+                return
+        except KeyError:
+            LOGGER.debug("No such device %s", response[5].address)
+            return
+        rssi = 0
+        device.radio_details(lqi, rssi)
+        self.handle_message(device, response[1],
+                            response[2],
+                            response[3], response[4], response[-1])
+
+    def _handle_ack_data(self, response, lqi):
+        LOGGER.debug('ACK Data received %s %s', response[4], response[0])
+        # disabled because of https://github.com/fairecasoimeme/ZiGate/issues/324
+        # self._handle_frame_failure(response[4], response[0])
+
+    def _handle_zps_event(self, response, lqi):
+        LOGGER.debug('ZPS Event APS data confirm, message routed to %s %s', response[3], response[0])
+
+    def _handle_pdm_event(self, response, lqi):
+        try:
+            event = PDM_EVENT(response[0]).name
+        except ValueError:
+            event = 'Unknown event'
+        LOGGER.debug('PDM Event %s %s, record %s', response[0], event, response[1])
+
+    def _handle_aps_fail(self, response, lqi):
+        LOGGER.debug('APS Data confirm Fail %s %s', response[4], response[0])
+        self._handle_frame_failure(response[4], response[0])
+
+    def _handle_zcl_event(self, response, lqi):
+        LOGGER.warning('Extended error code %s', response[0])
 
     def _handle_frame_failure(self, message_tag, status):
         try:
-            send_fut = self._pending.pop(message_tag)
+            send_fut = self._pending.pop(int(message_tag))
             send_fut.set_result(status)
         except KeyError:
             LOGGER.warning("Unexpected message send failure")
@@ -235,14 +326,15 @@ class ControllerApplication(zigpy.application.ControllerApplication):
 
     async def _request(self, nwk, profile, cluster, src_ep, dst_ep, sequence, data,
                       expect_reply=True, use_ieee=False, addr_mode=2):
-        LOGGER.debug('request %s',
-                     (nwk, profile, cluster, src_ep, dst_ep, sequence, data, expect_reply, use_ieee,addr_mode,expect_reply))
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug('request %s',
+                         (nwk, profile, cluster, src_ep, dst_ep, sequence, data, expect_reply, use_ieee,addr_mode,expect_reply))
         try:
             v, lqi = await self._api.raw_aps_data_request(nwk, src_ep, dst_ep, profile, cluster, data, addr_mode,expect_reply=expect_reply)
         except NoResponseError:
             return 1, "ZiGate doesn't answer to command"
-        req_id = v[1]
-        send_fut = asyncio.Future()
+        req_id = int(v[1])
+        send_fut = asyncio.get_running_loop().create_future()
         self._pending[req_id] = send_fut
 
         if v[0] != 0:
@@ -271,15 +363,7 @@ class ZiGateDevice(zigpy.device.Device):
         """Initialize instance."""
 
         super().__init__(application, ieee, nwk)
-        port = application._config[CONF_DEVICE][CONF_DEVICE_PATH]
-        model = 'ZiGate USB-TTL'
-        if c.is_zigate_wifi(port):
-            model = 'ZiGate WiFi'
-        elif c.is_pizigate(port):
-            model = 'PiZiGate'
-        elif c.is_zigate_din(port):
-            model = 'ZiGate USB-DIN'
-        self._model = '{} {}'.format(model, application.version)
+        self._model = '{} {}'.format(application.device_model_prefix, application.version)
 
     @property
     def manufacturer(self):